@@ -15,14 +15,69 @@ NC='\033[0m' # No Color
 # Constants
 TEMPLATE_REPO="https://raw.githubusercontent.com/anthropics/claude-project-template/main"
 TEMPLATE_VERSION="v2.0"
+TEMPLATE_BUNDLE_URL="https://github.com/anthropics/claude-project-template/archive/refs/tags/$TEMPLATE_VERSION.tar.gz"
 BACKUP_DIR=".claude-template-backup"
+TEMPLATE_MANIFEST=".claude/template-manifest.txt"
+LANGUAGE_MAP_FILE=".claude/context/language-map.json"
+HOOK_LANGUAGES_FILE=".claude/hook-languages.conf"
+HOOKS_STATE_FILE=".claude/context/hooks-customization.txt"
+
+# Resolve the template checkout once, before main changes directory
+# (empty when the script is piped through curl)
+TEMPLATE_ROOT=""
+SCRIPT_PATH=""
+if [[ -n "${BASH_SOURCE[0]:-}" && -f "${BASH_SOURCE[0]}" ]]; then
+    TEMPLATE_ROOT="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+    SCRIPT_PATH="$TEMPLATE_ROOT/$(basename "${BASH_SOURCE[0]}")"
+fi
 
 # Global variables
 PROJECT_TYPE=""
+PROJECT_LANGUAGES=()    # Languages PROJECT_TYPE was detected from
+DETECT_MAX_DEPTH=4
 INSTALL_MODE="interactive"
 FORCE_INSTALL=false
+UPGRADE=false
+BACKUP_STRATEGY="auto"
+BACKUP_KEEP=3
 HOOKS_ONLY=false
 TARGET_DIR="$(pwd)"
+DOWNLOAD_JOBS=8
+WORK_DIR=""
+BUNDLE_SOURCE=""    # "remote" or a local .tar.gz path; empty for per-file downloads
+BUNDLE_ROOT=""      # Extracted bundle contents when installing from a bundle
+USE_CACHE=true
+CACHE_DIR="${XDG_CACHE_HOME:-$HOME/.cache}/claude-project-template"
+CACHE_MAX_MB=100
+GENERATE_MANIFEST=false
+SMOKE_RUNS=5            # Invocations per hook in the install self-test
+
+# Batch mode
+BATCH_SPECS=()          # Directory list files, directories or glob patterns
+BATCH_JOBS=""           # Concurrent installs (default: CPU count)
+BATCH_SUMMARY="claude-bootstrap-summary.json"
+BATCH_RESULT_FILE="${CLAUDE_BOOTSTRAP_RESULT:-}"    # Set by the batch parent for each child
+
+# Template manifest, one entry per index (see load_template_manifest)
+MANIFEST_PATHS=()
+MANIFEST_SHA256=()
+MANIFEST_SIZES=()
+MANIFEST_COMPONENTS=()
+MANIFEST_MODES=()
+
+# Fetch stage state
+FETCH_QUEUE=()      # Template paths queued for the next fetch stage
+FETCH_REQUIRED=()   # Matching required flags (true/false)
+FETCHED_FILES=()    # Paths fetched successfully by the last fetch stage
+POOL_PIDS=()        # Background jobs started through the worker pool
+CHILD_ARGS=()       # Options passed to each batch install
+FETCH_SOURCE=""     # Where fetch_template_source found the last file
+
+# Profiling (--profile)
+PROFILE_FILE=""
+PROFILE_PHASES=()       # "name elapsed_ms" per main phase
+PROFILE_DOWNLOADS=()    # "status elapsed_ms source path" per fetched file
+PROFILE_HOOKS=()        # "hook status p50_ms p95_ms timeout_ms" per smoke-tested hook
 
 # Banner
 show_banner() {
@@ -46,9 +101,35 @@ Usage: $0 [OPTIONS]
 OPTIONS:
     -h, --help              Show this help message
     -f, --force             Force installation (overwrite existing files)
+    -u, --upgrade           Upgrade an existing installation, backing up and
+                            replacing only template files that changed
+    --backup-strategy S     Full backup method: auto (reflink, else copy),
+                            reflink, hardlink, copy (default: $BACKUP_STRATEGY);
+                            hardlinked backups change when files are edited in place
+    --backup-keep N         Backup generations to keep (default: $BACKUP_KEEP)
     -m, --mode MODE         Installation mode: interactive, auto, hooks-only
     -t, --type TYPE         Project type: node, python, go, java, auto
     -d, --dir DIRECTORY     Target directory (default: current directory)
+    --detect-depth N        Directory depth scanned for language markers
+                            (default: $DETECT_MAX_DEPTH)
+    --batch SPEC            Install into many projects: a file listing one
+                            directory per line (relative to the file), a
+                            directory, or a quoted glob of directories
+                            (repeatable; implies --mode auto unless hooks-only)
+    --batch-jobs N          Concurrent batch installs (default: CPU count)
+    --summary FILE          Batch JSON summary (default: $BATCH_SUMMARY)
+    -j, --jobs N            Parallel template downloads (default: $DOWNLOAD_JOBS)
+    -b, --bundle SOURCE     Install from one template archive: "remote" for the
+                            $TEMPLATE_VERSION release tarball, or a local .tar.gz path
+    --cache-dir DIRECTORY   Shared download cache (default: $CACHE_DIR)
+    --cache-size MB         Cache size limit before LRU eviction (default: $CACHE_MAX_MB)
+    --no-cache              Always download templates, bypassing the cache
+    --generate-manifest     Regenerate $TEMPLATE_MANIFEST in the template checkout
+    --smoke-runs N          Times each installed hook is run by the self-test
+                            (default: $SMOKE_RUNS; 0 skips it)
+    --profile FILE          Write a JSON timing report for each install phase
+                            and downloaded file (one per target in batch mode,
+                            next to its log)
     -v, --version           Show version information
 
 INSTALLATION MODES:
@@ -70,6 +151,13 @@ EXAMPLES:
     $0 --type node          Install for Node.js project
     $0 --mode hooks-only    Install only the hooks system
     $0 --dir /path/to/proj  Install in specific directory
+    $0 --upgrade            Upgrade hooks and prompts to $TEMPLATE_VERSION in place
+    $0 --batch repos.txt    Install into every directory listed in repos.txt
+    $0 --batch '/srv/repos/*'
+                            Install into every project matching a glob
+    $0 --bundle remote      Install from the $TEMPLATE_VERSION release archive
+    $0 --bundle ./tpl.tar.gz
+                            Install offline from a local template archive
 
 EOF
 }
@@ -86,6 +174,18 @@ parse_args() {
                 FORCE_INSTALL=true
                 shift
                 ;;
+            -u|--upgrade)
+                UPGRADE=true
+                shift
+                ;;
+            --backup-strategy)
+                BACKUP_STRATEGY="$2"
+                shift 2
+                ;;
+            --backup-keep)
+                BACKUP_KEEP="$2"
+                shift 2
+                ;;
             -m|--mode)
                 INSTALL_MODE="$2"
                 shift 2
@@ -98,6 +198,54 @@ parse_args() {
                 TARGET_DIR="$2"
                 shift 2
                 ;;
+            --detect-depth)
+                DETECT_MAX_DEPTH="$2"
+                shift 2
+                ;;
+            --batch)
+                BATCH_SPECS+=("$2")
+                shift 2
+                ;;
+            --batch-jobs)
+                BATCH_JOBS="$2"
+                shift 2
+                ;;
+            --summary)
+                BATCH_SUMMARY="$2"
+                shift 2
+                ;;
+            --profile)
+                PROFILE_FILE="$2"
+                shift 2
+                ;;
+            --smoke-runs)
+                SMOKE_RUNS="$2"
+                shift 2
+                ;;
+            -j|--jobs)
+                DOWNLOAD_JOBS="$2"
+                shift 2
+                ;;
+            -b|--bundle)
+                BUNDLE_SOURCE="$2"
+                shift 2
+                ;;
+            --cache-dir)
+                CACHE_DIR="$2"
+                shift 2
+                ;;
+            --cache-size)
+                CACHE_MAX_MB="$2"
+                shift 2
+                ;;
+            --no-cache)
+                USE_CACHE=false
+                shift
+                ;;
+            --generate-manifest)
+                GENERATE_MANIFEST=true
+                shift
+                ;;
             -v|--version)
                 echo "Claude Code Project Template $TEMPLATE_VERSION"
                 exit 0
@@ -120,6 +268,81 @@ parse_args() {
             ;;
     esac
     
+    # Validate backup options
+    case "$BACKUP_STRATEGY" in
+        auto|reflink|hardlink|copy) ;;
+        *)
+            echo -e "${RED}Invalid backup strategy: $BACKUP_STRATEGY${NC}"
+            show_usage
+            exit 1
+            ;;
+    esac
+    if [[ ! "$BACKUP_KEEP" =~ ^[1-9][0-9]*$ ]]; then
+        echo -e "${RED}Invalid backup generation count: $BACKUP_KEEP${NC}"
+        show_usage
+        exit 1
+    fi
+    
+    # Validate detection depth
+    if [[ ! "$DETECT_MAX_DEPTH" =~ ^[0-9]+$ ]]; then
+        echo -e "${RED}Invalid detection depth: $DETECT_MAX_DEPTH${NC}"
+        show_usage
+        exit 1
+    fi
+    
+    # Validate batch options
+    if [[ ${#BATCH_SPECS[@]} -gt 0 ]]; then
+        if [[ -z "$BATCH_JOBS" ]]; then
+            BATCH_JOBS="$(cpu_count)"
+        fi
+        if [[ ! "$BATCH_JOBS" =~ ^[1-9][0-9]*$ ]]; then
+            echo -e "${RED}Invalid batch job count: $BATCH_JOBS${NC}"
+            show_usage
+            exit 1
+        fi
+        if [[ "$INSTALL_MODE" == "interactive" ]]; then
+            INSTALL_MODE="auto"
+        fi
+    fi
+    
+    # Validate self-test runs
+    if [[ ! "$SMOKE_RUNS" =~ ^[0-9]+$ ]]; then
+        echo -e "${RED}Invalid smoke-test run count: $SMOKE_RUNS${NC}"
+        show_usage
+        exit 1
+    fi
+    
+    # Validate download concurrency
+    if [[ ! "$DOWNLOAD_JOBS" =~ ^[1-9][0-9]*$ ]]; then
+        echo -e "${RED}Invalid job count: $DOWNLOAD_JOBS${NC}"
+        show_usage
+        exit 1
+    fi
+    
+    # Validate cache size
+    if [[ ! "$CACHE_MAX_MB" =~ ^[0-9]+$ ]]; then
+        echo -e "${RED}Invalid cache size: $CACHE_MAX_MB${NC}"
+        show_usage
+        exit 1
+    fi
+    
+    # Keep output locations valid after main changes directory
+    if [[ "$CACHE_DIR" != /* ]]; then
+        CACHE_DIR="$(pwd)/$CACHE_DIR"
+    fi
+    if [[ -n "$PROFILE_FILE" && "$PROFILE_FILE" != /* ]]; then
+        PROFILE_FILE="$(pwd)/$PROFILE_FILE"
+    fi
+    
+    # Resolve local bundle paths before main changes directory
+    if [[ -n "$BUNDLE_SOURCE" && "$BUNDLE_SOURCE" != "remote" ]]; then
+        if [[ ! -f "$BUNDLE_SOURCE" ]]; then
+            echo -e "${RED}Template bundle not found: $BUNDLE_SOURCE${NC}"
+            exit 1
+        fi
+        BUNDLE_SOURCE="$(cd "$(dirname "$BUNDLE_SOURCE")" && pwd)/$(basename "$BUNDLE_SOURCE")"
+    fi
+    
     # Set hooks-only flag
     if [[ "$INSTALL_MODE" == "hooks-only" ]]; then
         HOOKS_ONLY=true
@@ -147,6 +370,101 @@ log_step() {
     echo -e "${CYAN}🔧 $1${NC}"
 }
 
+# Current wall-clock time in milliseconds
+now_ms() {
+    if [[ -n "${EPOCHREALTIME:-}" ]]; then
+        local now="${EPOCHREALTIME//[.,]/}"
+        echo "${now:0:${#now}-3}"
+        return 0
+    fi
+    
+    local now
+    now="$(date +%s%N 2>/dev/null)"
+    if [[ "$now" =~ ^[0-9]+$ ]]; then
+        echo "${now:0:${#now}-6}"
+    else
+        python3 -c 'import time; print(int(time.time() * 1000))'
+    fi
+}
+
+# Number of CPUs available
+cpu_count() {
+    getconf _NPROCESSORS_ONLN 2>/dev/null || sysctl -n hw.ncpu 2>/dev/null || echo 4
+}
+
+# Run a command, sending SIGTERM to it and everything it started if it is
+# still running after $1 ms, then SIGKILL after a short grace period
+run_with_timeout() {
+    local timeout_ms="$1"
+    shift
+    
+    # Job control puts the command in its own process group (pgid = pid),
+    # so the watchdog can signal its children too. Keep stdin explicitly:
+    # background jobs otherwise read /dev/null.
+    set -m
+    "$@" <&0 &
+    local pid=$!
+    set +m
+    (
+        sleep "$((timeout_ms / 1000)).$(printf '%03d' $((timeout_ms % 1000)))" &
+        local sleep_pid=$!
+        trap 'kill "$sleep_pid" 2>/dev/null; exit 0' TERM
+        wait "$sleep_pid"
+        
+        # Once fired, finish the escalation even if the command exits
+        trap '' TERM
+        kill -TERM -- "-$pid" 2>/dev/null || exit 0
+        local tick
+        for tick in 1 2 3 4 5 6 7 8 9 10; do
+            sleep 0.1
+            kill -0 -- "-$pid" 2>/dev/null || exit 0
+        done
+        kill -KILL -- "-$pid" 2>/dev/null
+    ) &
+    local watchdog=$!
+    
+    local status=0
+    wait "$pid" 2>/dev/null || status=$?
+    kill -TERM "$watchdog" 2>/dev/null || true
+    wait "$watchdog" 2>/dev/null || true
+    return $status
+}
+
+# Scratch directory for the current run, removed on exit
+setup_work_dir() {
+    WORK_DIR="$(mktemp -d "${TMPDIR:-/tmp}/claude-bootstrap.XXXXXX")"
+    trap 'rm -rf "$WORK_DIR"' EXIT
+}
+
+# Block until fewer than $1 pool jobs are still running
+pool_wait_for_slot() {
+    local max_jobs="$1"
+    
+    while true; do
+        local running=() pid
+        for pid in "${POOL_PIDS[@]}"; do
+            if kill -0 "$pid" 2>/dev/null; then
+                running+=("$pid")
+            fi
+        done
+        POOL_PIDS=("${running[@]}")
+        
+        if [[ ${#POOL_PIDS[@]} -lt $max_jobs ]]; then
+            return 0
+        fi
+        sleep 0.05
+    done
+}
+
+# Wait for every pool job to finish
+pool_wait_all() {
+    local pid
+    for pid in "${POOL_PIDS[@]}"; do
+        wait "$pid" 2>/dev/null || true
+    done
+    POOL_PIDS=()
+}
+
 # Check prerequisites
 check_prerequisites() {
     log_step "Checking prerequisites..."
@@ -177,52 +495,133 @@ check_prerequisites() {
     log_success "Prerequisites check completed"
 }
 
+# List candidate marker files in one walk of the project.
+# Git checkouts use the index plus untracked files, which honours .gitignore;
+# other trees fall back to find. Dependency and build directories are pruned.
+list_marker_files() {
+    local markers="package.json requirements.txt pyproject.toml setup.py Pipfile go.mod go.sum pom.xml build.gradle build.gradle.kts Cargo.toml"
+    local pruned="node_modules .venv venv target vendor dist build __pycache__ .git .claude testdata fixtures examples docs"
+    
+    if git rev-parse --is-inside-work-tree >/dev/null 2>&1; then
+        git ls-files --cached --others --exclude-standard 2>/dev/null
+    else
+        local prune_args=() find_args=() name
+        for name in $pruned; do
+            prune_args+=(-name "$name" -o)
+        done
+        for name in $markers; do
+            find_args+=(-name "$name" -o)
+        done
+        find . -mindepth 1 -maxdepth $((DETECT_MAX_DEPTH + 1)) \
+            \( "${prune_args[@]:0:${#prune_args[@]}-1}" \) -prune -o \
+            -type f \( "${find_args[@]:0:${#find_args[@]}-1}" \) -print 2>/dev/null |
+            sed 's#^\./##'
+    fi | awk -v markers="$markers" -v pruned="$pruned" -v max_depth="$DETECT_MAX_DEPTH" '
+        BEGIN {
+            split(markers, m, " "); for (i in m) is_marker[m[i]] = 1
+            split(pruned, p, " "); for (i in p) is_pruned[p[i]] = 1
+        }
+        {
+            n = split($0, parts, "/")
+            if (n - 1 > max_depth || !(parts[n] in is_marker)) next
+            for (i = 1; i < n; i++) if (parts[i] in is_pruned) next
+            print
+        }'
+}
+
+# Map marker files to "directory<TAB>language" lines, sorted and unique
+map_project_languages() {
+    list_marker_files | awk '
+        {
+            n = split($0, parts, "/")
+            file = parts[n]
+            dir = (n == 1) ? "." : substr($0, 1, length($0) - length(file) - 1)
+            if (file == "package.json") lang = "node"
+            else if (file ~ /^(requirements\.txt|pyproject\.toml|setup\.py|Pipfile)$/) lang = "python"
+            else if (file ~ /^go\.(mod|sum)$/) lang = "go"
+            else if (file ~ /^(pom\.xml|build\.gradle(\.kts)?)$/) lang = "java"
+            else if (file == "Cargo.toml") lang = "rust"
+            else next
+            print dir "\t" lang
+        }' | sort -u
+}
+
 # Project detection
 detect_project_type() {
-    if [[ -n "$PROJECT_TYPE" && "$PROJECT_TYPE" != "auto" ]]; then
-        return 0
-    fi
-    
     log_step "Detecting project type..."
     
-    local detected_types=()
-    
-    # Node.js detection
-    if [[ -f "package.json" ]]; then
-        detected_types+=("node")
-    fi
-    
-    # Python detection
-    if [[ -f "requirements.txt" ]] || [[ -f "pyproject.toml" ]] || [[ -f "setup.py" ]] || [[ -f "Pipfile" ]]; then
-        detected_types+=("python")
-    fi
-    
-    # Go detection
-    if [[ -f "go.mod" ]] || [[ -f "go.sum" ]]; then
-        detected_types+=("go")
-    fi
-    
-    # Java detection
-    if [[ -f "pom.xml" ]] || [[ -f "build.gradle" ]] || [[ -f "build.gradle.kts" ]]; then
-        detected_types+=("java")
+    # Per-directory language map, persisted by save_language_map
+    map_project_languages > "$WORK_DIR/language-map.tsv"
+    
+    # The project type follows the top-level markers; nested ones only
+    # decide it when the root has none (one package per directory)
+    local language directories=1
+    PROJECT_LANGUAGES=()
+    while read -r language; do
+        PROJECT_LANGUAGES+=("$language")
+    done < <(awk -F '\t' '$1 == "." { print $2 }' "$WORK_DIR/language-map.tsv")
+    if [[ ${#PROJECT_LANGUAGES[@]} -eq 0 ]]; then
+        while read -r language; do
+            PROJECT_LANGUAGES+=("$language")
+        done < <(cut -f2 "$WORK_DIR/language-map.tsv" | sort -u)
+        directories="$(cut -f1 "$WORK_DIR/language-map.tsv" | sort -u | wc -l | tr -d ' ')"
     fi
     
-    # Rust detection
-    if [[ -f "Cargo.toml" ]]; then
-        detected_types+=("rust")
+    if [[ -n "$PROJECT_TYPE" && "$PROJECT_TYPE" != "auto" ]]; then
+        return 0
     fi
     
     # Set project type based on detection
-    if [[ ${#detected_types[@]} -eq 0 ]]; then
+    if [[ ${#PROJECT_LANGUAGES[@]} -eq 0 ]]; then
         PROJECT_TYPE="unknown"
         log_warning "Could not detect project type"
-    elif [[ ${#detected_types[@]} -eq 1 ]]; then
-        PROJECT_TYPE="${detected_types[0]}"
+    elif [[ ${#PROJECT_LANGUAGES[@]} -eq 1 ]]; then
+        PROJECT_TYPE="${PROJECT_LANGUAGES[0]}"
         log_success "Detected project type: $PROJECT_TYPE"
     else
         PROJECT_TYPE="multi"
-        log_info "Detected multi-language project: ${detected_types[*]}"
+        if [[ $directories -gt 1 ]]; then
+            log_info "Detected multi-language project: ${PROJECT_LANGUAGES[*]} ($directories directories)"
+        else
+            log_info "Detected multi-language project: ${PROJECT_LANGUAGES[*]}"
+        fi
+    fi
+}
+
+# Write the per-directory language map to .claude/context/ so hooks can
+# route work by path without re-scanning the project
+save_language_map() {
+    local map_tsv="$WORK_DIR/language-map.tsv"
+    if [[ ! -f "$map_tsv" ]]; then
+        return 0
     fi
+    
+    mkdir -p "$(dirname "$LANGUAGE_MAP_FILE")"
+    awk -F'\t' -v depth="$DETECT_MAX_DEPTH" -v generated="$(date -u +%Y-%m-%dT%H:%M:%SZ)" '
+        function quote(s) { gsub(/\\/, "\\\\", s); gsub(/"/, "\\\"", s); return "\"" s "\"" }
+        {
+            if ($1 in langs) {
+                langs[$1] = langs[$1] ", " quote($2)
+            } else {
+                order[++count] = $1
+                langs[$1] = quote($2)
+            }
+            if (!($2 in seen)) { seen[$2] = 1; all = (all == "") ? quote($2) : all ", " quote($2) }
+        }
+        END {
+            print "{"
+            print "  \"version\": 1,"
+            print "  \"generated\": " quote(generated) ","
+            print "  \"max_depth\": " depth ","
+            print "  \"languages\": [" all "],"
+            printf "  \"directories\": {"
+            for (i = 1; i <= count; i++) {
+                printf "%s\n    %s: [%s]", (i > 1 ? "," : ""), quote(order[i]), langs[order[i]]
+            }
+            print (count > 0 ? "\n  }" : "}")
+            print "}"
+        }' "$map_tsv" > "$LANGUAGE_MAP_FILE.part"
+    mv -f "$LANGUAGE_MAP_FILE.part" "$LANGUAGE_MAP_FILE"
 }
 
 # Interactive configuration
@@ -272,7 +671,7 @@ interactive_config() {
     esac
     
     # Force overwrite confirmation
-    if [[ -d ".claude" ]] && [[ "$FORCE_INSTALL" != true ]]; then
+    if [[ -d ".claude" ]] && [[ "$FORCE_INSTALL" != true ]] && [[ "$UPGRADE" != true ]]; then
         echo ""
         log_warning "Existing .claude directory detected"
         read -p "Backup and overwrite? (y/n): " -n 1 -r
@@ -288,7 +687,71 @@ interactive_config() {
     echo ""
 }
 
-# Create backup
+# Make room for a new backup: BACKUP_DIR becomes BACKUP_DIR.1 and so on,
+# keeping at most BACKUP_KEEP generations including the new one
+rotate_backups() {
+    local generation i
+    
+    # Drop the oldest slot and anything left over from a larger limit
+    for generation in "$BACKUP_DIR".[0-9]*; do
+        i="${generation##*.}"
+        if [[ -d "$generation" && "$i" =~ ^[0-9]+$ && $i -ge $((BACKUP_KEEP - 1)) ]]; then
+            rm -rf "$generation"
+        fi
+    done
+    
+    for ((i = BACKUP_KEEP - 2; i >= 1; i--)); do
+        if [[ -d "$BACKUP_DIR.$i" ]]; then
+            mv "$BACKUP_DIR.$i" "$BACKUP_DIR.$((i + 1))"
+        fi
+    done
+    
+    if [[ ! -d "$BACKUP_DIR" ]]; then
+        return 0
+    elif [[ $BACKUP_KEEP -gt 1 ]]; then
+        mv "$BACKUP_DIR" "$BACKUP_DIR.1"
+    else
+        rm -rf "$BACKUP_DIR"
+    fi
+}
+
+# Snapshot directory $2 to $3 using strategy $1; fails if unsupported here
+snapshot_tree() {
+    local strategy="$1"
+    local source_dir="$2"
+    local target_dir="$3"
+    local gnu_cp=false
+    if cp --version 2>/dev/null | grep -q "GNU"; then
+        gnu_cp=true
+    fi
+    
+    case "$strategy" in
+        reflink)
+            if [[ "$gnu_cp" == true ]]; then
+                cp -a --reflink=always "$source_dir" "$target_dir" 2>/dev/null
+            else
+                # macOS clonefile(2)
+                cp -Rc "$source_dir" "$target_dir" 2>/dev/null
+            fi
+            ;;
+        hardlink)
+            if [[ "$gnu_cp" == true ]]; then
+                cp -al "$source_dir" "$target_dir" 2>/dev/null
+            else
+                mkdir -p "$target_dir" && (cd "$source_dir" && pax -rwl . "$target_dir") 2>/dev/null
+            fi
+            ;;
+        copy)
+            cp -r "$source_dir" "$target_dir"
+            ;;
+    esac
+}
+
+# Create backup.
+# Reflinks make the snapshot O(metadata) without sharing data. Hardlinks
+# share inodes with the live tree, so any file edited in place afterwards
+# (settings, knowledge, logs) would change in every generation; auto never
+# picks them and they are only used when requested explicitly.
 create_backup() {
     if [[ ! -d ".claude" ]]; then
         return 0
@@ -296,189 +759,502 @@ create_backup() {
     
     log_step "Creating backup of existing configuration..."
     
-    if [[ -d "$BACKUP_DIR" ]]; then
-        rm -rf "$BACKUP_DIR"
+    local strategies=("$BACKUP_STRATEGY")
+    if [[ "$BACKUP_STRATEGY" == "auto" ]]; then
+        strategies=(reflink copy)
     fi
     
-    cp -r ".claude" "$BACKUP_DIR"
-    log_success "Backup created: $BACKUP_DIR"
+    # Older generations are only rotated once the new snapshot exists
+    local strategy staging="$BACKUP_DIR.new"
+    for strategy in "${strategies[@]}"; do
+        rm -rf "$staging"
+        if snapshot_tree "$strategy" ".claude" "$staging"; then
+            rotate_backups
+            mv "$staging" "$BACKUP_DIR"
+            log_success "Backup created ($strategy): $BACKUP_DIR"
+            return 0
+        fi
+    done
+    rm -rf "$staging"
+    
+    log_error "Failed to create backup with strategy: $BACKUP_STRATEGY"
+    exit 1
 }
 
-# Download template files
-download_template_file() {
-    local file_path="$1"
+# Preserve $1 at $2, sharing storage through a reflink where possible.
+# Never a hardlink: a file whose replacement fails to download stays live,
+# and later in-place edits (chmod, customization) would change the backup.
+clone_or_copy() {
+    local source_path="$1"
     local target_path="$2"
-    local required="${3:-true}"
     
-    # Create directory if it doesn't exist
     mkdir -p "$(dirname "$target_path")"
-    
-    # Try to download from local template first (if we're in the template repo)
-    local template_root
-    template_root="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
-    
-    if [[ -f "$template_root/$file_path" ]]; then
-        cp "$template_root/$file_path" "$target_path"
-        return 0
+    cp -p --reflink=auto "$source_path" "$target_path" 2>/dev/null ||
+        cp -p "$source_path" "$target_path"
+}
+
+# Config files the install steps replace wholesale (setup-env.sh is generated)
+upgrade_config_files() {
+    if [[ "$HOOKS_ONLY" != true ]]; then
+        echo ".claude/.mcp.json"
+        echo ".claude/commands.json"
     fi
+    echo ".claude/settings.template.json"
+    echo ".claude/setup-env.sh"
+}
+
+# Stage the upgraded copy of config file $1 under $WORK_DIR/upgrade; the
+# install steps then use the staged copy, so what gets installed is exactly
+# what the plan compared against
+stage_upgrade_config() {
+    local file_path="$1"
+    local staged="$WORK_DIR/upgrade/$file_path"
     
-    # Download from remote repository
-    local url="$TEMPLATE_REPO/$file_path"
-    if curl -fsSL "$url" -o "$target_path" 2>/dev/null; then
-        return 0
-    elif [[ "$required" == "true" ]]; then
-        log_error "Failed to download required file: $file_path"
-        return 1
+    if [[ "$file_path" == ".claude/setup-env.sh" ]]; then
+        mkdir -p "$(dirname "$staged")"
+        write_setup_env "$staged"
+    else
+        download_template_file "$file_path" "$staged" false
+        [[ -f "$staged" ]]
     fi
-    
-    return 0
 }
 
-# Install core template files
-install_core_files() {
-    if [[ "$HOOKS_ONLY" == true ]]; then
+# Back up only the installed files an upgrade is about to replace.
+# Logs, context and knowledge are never part of the manifest, so they are
+# never copied.
+create_upgrade_backup() {
+    if [[ ! -d ".claude" ]]; then
         return 0
     fi
     
-    log_step "Installing core template files..."
-    
-    # Download core files
-    download_template_file "CLAUDE.md" "CLAUDE.md"
-    download_template_file "CLAUDE.local.md" "CLAUDE.local.md"
+    log_step "Planning upgrade to $TEMPLATE_VERSION..."
     
-    # Customize CLAUDE.md for project
-    if [[ -f "CLAUDE.md" ]]; then
-        sed -i.bak "s/Claude Project Template/$(basename "$TARGET_DIR")/g" "CLAUDE.md" 2>/dev/null || true
-        sed -i.bak "s/Development Template & Starter Kit/$PROJECT_TYPE Project/g" "CLAUDE.md" 2>/dev/null || true
-        rm -f "CLAUDE.md.bak"
+    local components=(hooks)
+    if [[ "$HOOKS_ONLY" != true ]]; then
+        components+=(prompts)
     fi
     
-    log_success "Core files installed"
-}
-
-# Install hooks system
-install_hooks() {
-    log_step "Installing hooks system..."
+    local component file_path total=0 changed=() added=0
+    for component in "${components[@]}"; do
+        total=$((total + $(manifest_count "$component")))
+        while read -r file_path; do
+            if [[ -f "$file_path" ]]; then
+                changed+=("$file_path")
+            else
+                added=$((added + 1))
+            fi
+        done < <(manifest_stale_files "$component")
+    done
     
-    # Create hooks directory structure
-    mkdir -p ".claude/hooks"/{post-tool-use,pre-tool-use,notification,stop,utils,logs,templates}
+    # Config files have no manifest entry; compare against staged copies
+    while read -r file_path; do
+        stage_upgrade_config "$file_path" || continue
+        total=$((total + 1))
+        if [[ ! -f "$file_path" ]]; then
+            added=$((added + 1))
+        elif [[ "$(file_sha256 "$file_path")" != "$(file_sha256 "$WORK_DIR/upgrade/$file_path")" ]]; then
+            changed+=("$file_path")
+        fi
+    done < <(upgrade_config_files)
     
-    # Download hook files
-    local hook_files=(
-        ".claude/hooks/post-tool-use/format-code.sh"
-        ".claude/hooks/post-tool-use/lint-code.sh"
-        ".claude/hooks/post-tool-use/run-tests.sh"
-        ".claude/hooks/post-tool-use/sync-dependencies.sh"
-        ".claude/hooks/post-tool-use/cleanup-imports.sh"
-        ".claude/hooks/post-tool-use/update-docs.sh"
-        ".claude/hooks/post-tool-use/git-auto-stage.sh"
-        ".claude/hooks/post-tool-use/smart-context-builder.sh"
-        ".claude/hooks/post-tool-use/dependency-impact-analyzer.sh"
-        ".claude/hooks/post-tool-use/import-optimizer.sh"
-        ".claude/hooks/pre-tool-use/security-check.sh"
-        ".claude/hooks/pre-tool-use/backup-file.sh"
-        ".claude/hooks/pre-tool-use/bash-validate.sh"
-        ".claude/hooks/pre-tool-use/multi-edit-check.sh"
-        ".claude/hooks/pre-tool-use/performance-check.sh"
-        ".claude/hooks/pre-tool-use/pattern-enforcer.sh"
-        ".claude/hooks/notification/log-notification.sh"
-        ".claude/hooks/notification/handle-error.sh"
-        ".claude/hooks/stop/cleanup-temp.sh"
-        ".claude/hooks/stop/update-session-knowledge.sh"
-        ".claude/hooks/utils/common.sh"
-        ".claude/hooks/utils/neo4j_mcp.py"
-    )
+    log_info "Upgrade plan: ${#changed[@]} changed, $added new, $((total - ${#changed[@]} - added)) unchanged"
+    if [[ ${#changed[@]} -eq 0 ]]; then
+        return 0
+    fi
     
-    local installed_hooks=0
-    for hook_file in "${hook_files[@]}"; do
-        if download_template_file "$hook_file" "$hook_file" false; then
-            chmod +x "$hook_file" 2>/dev/null || true
-            ((installed_hooks++))
-        fi
+    rotate_backups
+    for file_path in "${changed[@]}"; do
+        clone_or_copy "$file_path" "$BACKUP_DIR/${file_path#.claude/}"
     done
+    log_success "Backed up ${#changed[@]} files: $BACKUP_DIR"
+}
+
+# SHA-256 of each file, one "hash  path" line per file, in one process
+sha256_files() {
+    if command -v sha256sum >/dev/null 2>&1; then
+        sha256sum "$@"
+    else
+        shasum -a 256 "$@"
+    fi
+}
+
+# SHA-256 of a file
+file_sha256() {
+    sha256_files "$1" | cut -d' ' -f1
+}
+
+# Template cache layout (shared by every install for the current user):
+#   objects/<sha256>                  file contents, addressed by hash
+#   index/<version>/<key>             sha256 of <key> in that template version
+# Index entries are only written for downloads pinned to TEMPLATE_VERSION
+# (the release bundle); per-file downloads come from the mutable main
+# branch, so they are stored and served by manifest hash alone.
+# Object mtimes record last use and drive LRU eviction.
+
+# Copy cached content for key $1 (or for hash $3, when known; the key may
+# then be empty) to $2; returns 1 on a miss
+cache_lookup() {
+    local key="$1"
+    local target_path="$2"
+    local sha="${3:-}"
+    local index_file="$CACHE_DIR/index/$TEMPLATE_VERSION/$key"
     
-    # Download hooks configuration
-    download_template_file ".claude/hooks.json" ".claude/hooks.json"
+    if [[ "$USE_CACHE" != true ]]; then
+        return 1
+    fi
     
-    # Customize hooks based on project type
-    customize_hooks_for_project
+    if [[ -z "$sha" || "$sha" == "-" ]]; then
+        [[ -f "$index_file" ]] || return 1
+        read -r sha < "$index_file" || return 1
+    fi
+    local object="$CACHE_DIR/objects/$sha"
+    [[ -n "$sha" && -f "$object" ]] || return 1
     
-    log_success "Installed $installed_hooks hook files"
+    cp "$object" "$target_path" || return 1
+    touch "$object" 2>/dev/null || true
 }
 
-# Customize hooks for project type
-customize_hooks_for_project() {
-    if [[ ! -f ".claude/hooks.json" ]]; then
+# Record file $2 as the content of key $1, or only by hash when the key is
+# empty (best effort)
+cache_store() {
+    local key="$1"
+    local source_path="$2"
+    
+    if [[ "$USE_CACHE" != true ]]; then
         return 0
     fi
     
-    # Project-specific hook customization
-    case "$PROJECT_TYPE" in
-        "python")
-            log_info "Configuring hooks for Python project"
-            # Could disable JS/TS specific hooks or adjust priorities
-            ;;
-        "node")
-            log_info "Configuring hooks for Node.js project"
-            # Could enable npm-specific features
-            ;;
-        "go")
-            log_info "Configuring hooks for Go project"
-            # Could enable Go-specific tooling
-            ;;
-        "java")
-            log_info "Configuring hooks for Java project"
-            # Could enable Maven/Gradle specific features
-            ;;
-    esac
+    local sha
+    sha="$(file_sha256 "$source_path")" || return 1
+    local object="$CACHE_DIR/objects/$sha"
+    mkdir -p "$CACHE_DIR/objects" 2>/dev/null || return 1
+    
+    # Write through temp files so concurrent installs never see partial entries
+    local tmp
+    if [[ ! -f "$object" ]]; then
+        tmp="$(mktemp "$CACHE_DIR/objects/.tmp.XXXXXX")" || return 1
+        cp "$source_path" "$tmp" && mv -f "$tmp" "$object" || { rm -f "$tmp"; return 1; }
+    fi
+    if [[ -z "$key" ]]; then
+        return 0
+    fi
+    
+    local index_file="$CACHE_DIR/index/$TEMPLATE_VERSION/$key"
+    mkdir -p "$(dirname "$index_file")" 2>/dev/null || return 1
+    tmp="$(mktemp "$index_file.XXXXXX")" || return 1
+    echo "$sha" > "$tmp" && mv -f "$tmp" "$index_file" || { rm -f "$tmp"; return 1; }
 }
 
-# Install MCP configuration
-install_mcp_config() {
-    if [[ "$HOOKS_ONLY" == true ]]; then
+# Evict least recently used objects until the cache fits in CACHE_MAX_MB
+prune_template_cache() {
+    local objects_dir="$CACHE_DIR/objects"
+    if [[ "$USE_CACHE" != true || ! -d "$objects_dir" ]]; then
         return 0
     fi
     
-    log_step "Installing MCP configuration..."
+    local limit_kb=$((CACHE_MAX_MB * 1024))
+    local used_kb
+    used_kb="$(du -sk "$objects_dir" 2>/dev/null | cut -f1)"
+    if [[ -z "$used_kb" || $used_kb -le $limit_kb ]]; then
+        return 0
+    fi
     
-    download_template_file ".claude/.mcp.json" ".claude/.mcp.json" false
+    local object size_kb evicted=0
+    while read -r object; do
+        [[ $used_kb -le $limit_kb ]] && break
+        size_kb="$(du -sk "$objects_dir/$object" 2>/dev/null | cut -f1)"
+        rm -f "$objects_dir/$object"
+        used_kb=$((used_kb - ${size_kb:-0}))
+        evicted=$((evicted + 1))
+    done < <(ls -tr "$objects_dir")
     
-    if [[ -f ".claude/.mcp.json" ]]; then
-        log_success "MCP configuration installed"
-    else
-        log_warning "MCP configuration not available"
-    fi
+    log_info "Template cache trimmed: evicted $evicted entries"
 }
 
-# Install commands
-install_commands() {
-    if [[ "$HOOKS_ONLY" == true ]]; then
+# Download and extract the template bundle in a single pass.
+# Only the selected components are extracted, into a staging directory,
+# so a bad archive aborts before anything in the project is touched.
+fetch_template_bundle() {
+    if [[ -z "$BUNDLE_SOURCE" ]]; then
         return 0
     fi
     
-    log_step "Installing command suite..."
-    
-    download_template_file ".claude/commands.json" ".claude/commands.json" false
+    log_step "Fetching template bundle..."
+    
+    local archive="$BUNDLE_SOURCE"
+    local started source="local"
+    started="$(now_ms)"
+    if [[ "$BUNDLE_SOURCE" == "remote" ]]; then
+        archive="$WORK_DIR/template-$TEMPLATE_VERSION.tar.gz"
+        if cache_lookup "bundle.tar.gz" "$archive"; then
+            source="cache"
+            log_info "Using cached template bundle"
+        elif curl -fsSL "$TEMPLATE_BUNDLE_URL" -o "$archive" 2>/dev/null; then
+            source="remote"
+            cache_store "bundle.tar.gz" "$archive" || true
+        else
+            log_error "Failed to download template bundle: $TEMPLATE_BUNDLE_URL"
+            exit 1
+        fi
+    fi
+    if [[ -n "$PROFILE_FILE" ]]; then
+        PROFILE_DOWNLOADS+=("ok $(( $(now_ms) - started )) $source ${archive##*/}")
+    fi
     
-    if [[ -f ".claude/commands.json" ]]; then
-        log_success "Command suite installed (32 professional commands)"
+    # Archives are laid out like GitHub release tarballs: one top-level directory
+    local include=("*/.claude/*")
+    local exclude=("*/.claude/hooks/logs/*" "*/.claude/context/*" "*/.claude/knowledge/*")
+    if [[ "$HOOKS_ONLY" == true ]]; then
+        exclude+=("*/.claude/prompts/*" "*/.claude/commands.json" "*/.claude/.mcp.json")
     else
-        log_warning "Command suite not available"
+        include+=("*/CLAUDE*.md")
     fi
+    
+    local tar_args=(-xzf "$archive" -C "$WORK_DIR/bundle" --strip-components=1)
+    if tar --version 2>/dev/null | grep -q "GNU tar"; then
+        tar_args+=(--wildcards)
+    fi
+    local pattern
+    for pattern in "${exclude[@]}"; do
+        tar_args+=(--exclude="$pattern")
+    done
+    
+    mkdir -p "$WORK_DIR/bundle"
+    if ! tar "${tar_args[@]}" "${include[@]}" 2>/dev/null || [[ ! -f "$WORK_DIR/bundle/.claude/hooks.json" ]]; then
+        log_error "Invalid template bundle: $archive"
+        exit 1
+    fi
+    
+    BUNDLE_ROOT="$WORK_DIR/bundle"
+    log_success "Template bundle extracted ($TEMPLATE_VERSION)"
 }
 
-# Install prompts
-install_prompts() {
-    if [[ "$HOOKS_ONLY" == true ]]; then
+# Check a fetched file against its manifest hash ("-" or empty skips the check)
+verify_template_file() {
+    local candidate="$1"
+    local expected_sha="$2"
+    
+    if [[ -z "$expected_sha" || "$expected_sha" == "-" ]]; then
         return 0
     fi
+    [[ "$(file_sha256 "$candidate")" == "$expected_sha" ]]
+}
+
+# Copy the first source of a template file that passes verification to $2
+fetch_template_source() {
+    local file_path="$1"
+    local candidate="$2"
+    local expected_sha="$3"
+    
+    # Copies staged (and backed up against) by the upgrade plan
+    if [[ -n "$WORK_DIR" && -f "$WORK_DIR/upgrade/$file_path" ]]; then
+        FETCH_SOURCE="staged"
+        cp "$WORK_DIR/upgrade/$file_path" "$candidate"
+        return $?
+    fi
     
-    log_step "Installing professional prompts..."
+    # A bundle install never falls back to per-file downloads
+    if [[ -n "$BUNDLE_ROOT" ]]; then
+        FETCH_SOURCE="bundle"
+        [[ -f "$BUNDLE_ROOT/$file_path" ]] && cp "$BUNDLE_ROOT/$file_path" "$candidate" &&
+            verify_template_file "$candidate" "$expected_sha"
+        return $?
+    fi
     
-    # Create prompts directory structure
-    mkdir -p ".claude/prompts"/{development,testing,architecture,security,deployment,documentation,workflow,project-management}
+    # Files downloaded by earlier installs, when the manifest pins their content
+    local hashed=false
+    [[ -n "$expected_sha" && "$expected_sha" != "-" ]] && hashed=true
+    if [[ "$hashed" == true ]] &&
+        cache_lookup "" "$candidate" "$expected_sha" &&
+        verify_template_file "$candidate" "$expected_sha"; then
+        FETCH_SOURCE="cache"
+        return 0
+    fi
+    
+    # Try to download from local template first (if we're in the template repo)
+    if [[ -n "$TEMPLATE_ROOT" && -f "$TEMPLATE_ROOT/$file_path" ]]; then
+        if cp "$TEMPLATE_ROOT/$file_path" "$candidate" &&
+            verify_template_file "$candidate" "$expected_sha"; then
+            FETCH_SOURCE="local"
+            return 0
+        fi
+        log_warning "Checksum mismatch in local template (run --generate-manifest): $file_path"
+    fi
+    
+    # Download from remote repository
+    local url="$TEMPLATE_REPO/$file_path"
+    FETCH_SOURCE="remote"
+    if curl -fsSL "$url" -o "$candidate" 2>/dev/null; then
+        if verify_template_file "$candidate" "$expected_sha"; then
+            if [[ "$hashed" == true ]]; then
+                cache_store "" "$candidate" || true
+            fi
+            return 0
+        fi
+        log_warning "Checksum mismatch in download: $file_path"
+    fi
+    
+    return 1
+}
+
+# Fetch a template file from the first source that has it
+fetch_template_file() {
+    local file_path="$1"
+    local target_path="$2"
+    
+    # Create directory if it doesn't exist
+    mkdir -p "$(dirname "$target_path")"
+    
+    # Stage next to the target and rename into place, so a failed or
+    # corrupt download never replaces a working file
+    local candidate="$target_path.part.$$"
+    if fetch_template_source "$file_path" "$candidate" "$(manifest_sha256 "$file_path")"; then
+        mv -f "$candidate" "$target_path"
+        return $?
+    fi
     
-    # List of available prompts
+    rm -f "$candidate"
+    return 1
+}
+
+# Download template files
+download_template_file() {
+    local file_path="$1"
+    local target_path="$2"
+    local required="${3:-true}"
+    local started status="ok"
+    started="$(now_ms)"
+    
+    FETCH_SOURCE="none"
+    if ! fetch_template_file "$file_path" "$target_path"; then
+        status="skipped"
+        [[ "$required" == "true" ]] && status="failed"
+    fi
+    if [[ -n "$PROFILE_FILE" ]]; then
+        PROFILE_DOWNLOADS+=("$status $(( $(now_ms) - started )) $FETCH_SOURCE $file_path")
+    fi
+    
+    if [[ "$status" == "failed" ]]; then
+        log_error "Failed to download required file: $file_path"
+        return 1
+    fi
+    
+    return 0
+}
+
+# Queue a template file for the next fetch stage
+queue_template_file() {
+    FETCH_QUEUE+=("$1")
+    FETCH_REQUIRED+=("${2:-true}")
+}
+
+# Fetch one queued file and record "status elapsed_ms source path" in $3
+fetch_worker() {
+    local file_path="$1"
+    local required="$2"
+    local result_file="$3"
+    local status="ok"
+    local start
+    start="$(now_ms)"
+    
+    if ! fetch_template_file "$file_path" "$file_path"; then
+        if [[ "$required" == "true" ]]; then
+            status="failed"
+        else
+            status="skipped"
+        fi
+    fi
+    
+    echo "$status $(( $(now_ms) - start )) ${FETCH_SOURCE:-none} $file_path" > "$result_file"
+}
+
+# Download every queued file with up to $DOWNLOAD_JOBS concurrent workers.
+# Fills FETCHED_FILES and returns 1 if any required file failed.
+run_fetch_queue() {
+    local results_dir
+    results_dir="$(mktemp -d "$WORK_DIR/fetch.XXXXXX")"
+    
+    local i
+    for ((i = 0; i < ${#FETCH_QUEUE[@]}; i++)); do
+        pool_wait_for_slot "$DOWNLOAD_JOBS"
+        fetch_worker "${FETCH_QUEUE[$i]}" "${FETCH_REQUIRED[$i]}" "$results_dir/$i" &
+        POOL_PIDS+=($!)
+    done
+    pool_wait_all
+    
+    # Report in queue order so output is stable across runs
+    local failed=0 status elapsed source file_path
+    FETCHED_FILES=()
+    for ((i = 0; i < ${#FETCH_QUEUE[@]}; i++)); do
+        if [[ -f "$results_dir/$i" ]]; then
+            read -r status elapsed source file_path < "$results_dir/$i"
+        else
+            status="failed"
+            elapsed=0
+            source="none"
+            file_path="${FETCH_QUEUE[$i]}"
+        fi
+        if [[ -n "$PROFILE_FILE" ]]; then
+            PROFILE_DOWNLOADS+=("$status $elapsed $source $file_path")
+        fi
+        
+        case "$status" in
+            ok)
+                FETCHED_FILES+=("$file_path")
+                echo -e "   ${GREEN}✓${NC} $file_path (${elapsed}ms)"
+                ;;
+            skipped)
+                echo -e "   ${YELLOW}-${NC} $file_path (unavailable, ${elapsed}ms)"
+                ;;
+            *)
+                log_error "Failed to download required file: $file_path"
+                failed=1
+                ;;
+        esac
+    done
+    
+    FETCH_QUEUE=()
+    FETCH_REQUIRED=()
+    rm -rf "$results_dir"
+    return $failed
+}
+
+# Mode for manifest entries that do not record one: scripts are executable
+default_file_mode() {
+    case "$1" in
+        *.sh|*.py) echo "755" ;;
+        *) echo "644" ;;
+    esac
+}
+
+# Built-in file list, used when no template manifest can be fetched.
+# Entries carry no hash, so they are always downloaded and never verified.
+builtin_manifest() {
+    local hook_files=(
+        ".claude/hooks/post-tool-use/format-code.sh"
+        ".claude/hooks/post-tool-use/lint-code.sh"
+        ".claude/hooks/post-tool-use/run-tests.sh"
+        ".claude/hooks/post-tool-use/sync-dependencies.sh"
+        ".claude/hooks/post-tool-use/cleanup-imports.sh"
+        ".claude/hooks/post-tool-use/update-docs.sh"
+        ".claude/hooks/post-tool-use/git-auto-stage.sh"
+        ".claude/hooks/post-tool-use/smart-context-builder.sh"
+        ".claude/hooks/post-tool-use/dependency-impact-analyzer.sh"
+        ".claude/hooks/post-tool-use/import-optimizer.sh"
+        ".claude/hooks/pre-tool-use/security-check.sh"
+        ".claude/hooks/pre-tool-use/backup-file.sh"
+        ".claude/hooks/pre-tool-use/bash-validate.sh"
+        ".claude/hooks/pre-tool-use/multi-edit-check.sh"
+        ".claude/hooks/pre-tool-use/performance-check.sh"
+        ".claude/hooks/pre-tool-use/pattern-enforcer.sh"
+        ".claude/hooks/notification/log-notification.sh"
+        ".claude/hooks/notification/handle-error.sh"
+        ".claude/hooks/stop/cleanup-temp.sh"
+        ".claude/hooks/stop/update-session-knowledge.sh"
+        ".claude/hooks/utils/common.sh"
+        ".claude/hooks/utils/neo4j_mcp.py"
+        ".claude/hooks.json"
+    )
     local prompt_files=(
         ".claude/prompts/development/feature-development.md"
         ".claude/prompts/development/debugging.md"
@@ -497,14 +1273,430 @@ install_prompts() {
         ".claude/prompts/project-management/repository-health.md"
     )
     
-    local installed_prompts=0
-    for prompt_file in "${prompt_files[@]}"; do
-        if download_template_file "$prompt_file" "$prompt_file" false; then
-            ((installed_prompts++))
+    local file_path
+    for file_path in "${hook_files[@]}"; do
+        echo "$file_path - - hooks $(default_file_mode "$file_path")"
+    done
+    for file_path in "${prompt_files[@]}"; do
+        echo "$file_path - - prompts 644"
+    done
+}
+
+# Write the template manifest for the checkout this script lives in
+generate_manifest() {
+    if [[ -z "$TEMPLATE_ROOT" || ! -d "$TEMPLATE_ROOT/.claude/hooks" ]]; then
+        log_error "--generate-manifest must be run from a template checkout"
+        exit 1
+    fi
+    
+    cd "$TEMPLATE_ROOT"
+    local file_path component mode count=0
+    {
+        echo "# Claude Code template manifest ($TEMPLATE_VERSION)"
+        echo "# Generated by: bootstrap.sh --generate-manifest"
+        echo "# path sha256 size component mode"
+        while read -r file_path; do
+            case "$file_path" in
+                .claude/prompts/*) component="prompts" ;;
+                *) component="hooks" ;;
+            esac
+            mode="644"
+            if [[ -x "$file_path" ]]; then
+                mode="755"
+            fi
+            echo "$file_path $(file_sha256 "$file_path") $(wc -c < "$file_path" | tr -d ' ') $component $mode"
+            count=$((count + 1))
+        done < <({
+            find .claude/hooks -type f ! -path "*/logs/*" ! -name "*.pyc"
+            echo ".claude/hooks.json"
+            find .claude/prompts -type f -name "*.md" 2>/dev/null
+        } | sort)
+    } > "$TEMPLATE_MANIFEST"
+    
+    log_success "Wrote $TEMPLATE_MANIFEST ($count files)"
+}
+
+# Load the manifest for TEMPLATE_VERSION, falling back to the built-in list
+load_template_manifest() {
+    local manifest_file="$WORK_DIR/template-manifest.txt"
+    local source="template"
+    
+    download_template_file "$TEMPLATE_MANIFEST" "$manifest_file" false
+    if [[ ! -f "$manifest_file" ]]; then
+        builtin_manifest > "$manifest_file"
+        source="built-in"
+    fi
+    
+    local file_path sha size component mode
+    while read -r file_path sha size component mode; do
+        [[ -z "$file_path" || "$file_path" == \#* ]] && continue
+        MANIFEST_PATHS+=("$file_path")
+        MANIFEST_SHA256+=("${sha:--}")
+        MANIFEST_SIZES+=("${size:--}")
+        MANIFEST_COMPONENTS+=("${component:-hooks}")
+        MANIFEST_MODES+=("${mode:-$(default_file_mode "$file_path")}")
+    done < "$manifest_file"
+    
+    log_info "Loaded $source manifest: ${#MANIFEST_PATHS[@]} files"
+}
+
+# Expected SHA-256 of a template path (empty when not in the manifest)
+manifest_sha256() {
+    local i
+    for ((i = 0; i < ${#MANIFEST_PATHS[@]}; i++)); do
+        if [[ "${MANIFEST_PATHS[$i]}" == "$1" ]]; then
+            echo "${MANIFEST_SHA256[$i]}"
+            return 0
+        fi
+    done
+}
+
+# Number of manifest entries in component $1
+manifest_count() {
+    local i count=0
+    for ((i = 0; i < ${#MANIFEST_PATHS[@]}; i++)); do
+        if [[ "${MANIFEST_COMPONENTS[$i]}" == "$1" ]]; then
+            count=$((count + 1))
+        fi
+    done
+    echo "$count"
+}
+
+# Make every installed manifest file that should be executable executable,
+# with a single chmod and without walking the .claude tree
+apply_manifest_modes() {
+    local i executables=()
+    for ((i = 0; i < ${#MANIFEST_PATHS[@]}; i++)); do
+        if [[ "${MANIFEST_MODES[$i]}" == 7* && -f "${MANIFEST_PATHS[$i]}" ]]; then
+            executables+=("${MANIFEST_PATHS[$i]}")
+        fi
+    done
+    
+    if [[ ${#executables[@]} -gt 0 ]]; then
+        chmod +x "${executables[@]}" 2>/dev/null || true
+    fi
+}
+
+# Print the paths of component $1 that are missing or differ from the manifest.
+# Installed files are checked by size first, then hashed in a single batch.
+manifest_stale_files() {
+    local component="$1"
+    local i existing=() expected_sizes=()
+    
+    for ((i = 0; i < ${#MANIFEST_PATHS[@]}; i++)); do
+        if [[ "${MANIFEST_COMPONENTS[$i]}" != "$component" ]]; then
+            continue
+        fi
+        if [[ -f "${MANIFEST_PATHS[$i]}" && "${MANIFEST_SHA256[$i]}" != "-" ]]; then
+            existing+=("${MANIFEST_PATHS[$i]}")
+            expected_sizes+=("${MANIFEST_SIZES[$i]}")
+        else
+            echo "${MANIFEST_PATHS[$i]}"
+        fi
+    done
+    
+    if [[ ${#existing[@]} -eq 0 ]]; then
+        return 0
+    fi
+    
+    # A size mismatch is stale without hashing; hooks.json is always hashed
+    # because its pruned size differs from upstream
+    local size file_path same_size=()
+    i=0
+    while read -r size file_path; do
+        [[ $i -ge ${#existing[@]} ]] && break    # "total" line
+        if [[ "${expected_sizes[$i]}" == "-" || "${expected_sizes[$i]}" == "$size" ||
+            "$file_path" == ".claude/hooks.json" ]]; then
+            same_size+=("$file_path")
+        else
+            echo "$file_path"
+        fi
+        i=$((i + 1))
+    done < <(wc -c "${existing[@]}")
+    
+    if [[ ${#same_size[@]} -eq 0 ]]; then
+        return 0
+    fi
+    
+    local sha
+    while read -r sha file_path; do
+        if [[ "$sha" == "$(manifest_sha256 "$file_path")" ]]; then
+            continue
+        fi
+        # hooks.json is pruned after install, so compare its upstream hash
+        if [[ "$file_path" == ".claude/hooks.json" ]] && hooks_json_is_current "$sha"; then
+            continue
+        fi
+        echo "$file_path"
+    done < <(sha256_files "${same_size[@]}")
+}
+
+# Install core template files
+install_core_files() {
+    if [[ "$HOOKS_ONLY" == true ]]; then
+        return 0
+    fi
+    
+    # Upgrades never replace project documentation that already exists
+    if [[ "$UPGRADE" == true && -f "CLAUDE.md" ]]; then
+        return 0
+    fi
+    
+    log_step "Installing core template files..."
+    
+    # Download core files
+    download_template_file "CLAUDE.md" "CLAUDE.md"
+    download_template_file "CLAUDE.local.md" "CLAUDE.local.md"
+    
+    # Customize CLAUDE.md for project
+    if [[ -f "CLAUDE.md" ]]; then
+        sed -i.bak "s/Claude Project Template/$(basename "$TARGET_DIR")/g" "CLAUDE.md" 2>/dev/null || true
+        sed -i.bak "s/Development Template & Starter Kit/$PROJECT_TYPE Project/g" "CLAUDE.md" 2>/dev/null || true
+        rm -f "CLAUDE.md.bak"
+    fi
+    
+    log_success "Core files installed"
+}
+
+# Install hooks system
+install_hooks() {
+    log_step "Installing hooks system..."
+    
+    # Create hooks directory structure
+    mkdir -p ".claude/hooks"/{post-tool-use,pre-tool-use,notification,stop,utils,logs,templates}
+    
+    # Queue hook files that are missing or out of date
+    local hook_file
+    while read -r hook_file; do
+        if [[ "$hook_file" == ".claude/hooks.json" ]]; then
+            queue_template_file "$hook_file" true
+        else
+            queue_template_file "$hook_file" false
+        fi
+    done < <(manifest_stale_files hooks)
+    local up_to_date=$(( $(manifest_count hooks) - ${#FETCH_QUEUE[@]} ))
+    run_fetch_queue
+    
+    # Permissions are applied from the manifest in post_install
+    local installed_hooks=0
+    for hook_file in "${FETCHED_FILES[@]}"; do
+        if [[ "$hook_file" == .claude/hooks/* ]]; then
+            installed_hooks=$((installed_hooks + 1))
+        fi
+    done
+    
+    # Customize hooks based on project type
+    customize_hooks_for_project
+    
+    log_success "Installed $installed_hooks hook files ($up_to_date already up to date)"
+}
+
+# Languages a hook is useful for (empty means every language).
+# Projects can override entries in .claude/hook-languages.conf, one
+# "<hook> <language>..." line per hook. The defaults follow the tools each
+# hook drives (see Troubleshooting in README.md): import-optimizer rewrites
+# JS/TS and Python imports, cleanup-imports runs eslint, autoflake/isort
+# and goimports.
+hook_languages() {
+    local hook_name languages
+    if [[ -f "$HOOK_LANGUAGES_FILE" ]]; then
+        while read -r hook_name languages; do
+            if [[ "$hook_name" == "$1" ]]; then
+                echo "$languages"
+                return 0
+            fi
+        done < "$HOOK_LANGUAGES_FILE"
+    fi
+    
+    case "$1" in
+        import-optimizer.sh) echo "node python" ;;
+        cleanup-imports.sh) echo "node python go" ;;
+        *) echo "" ;;
+    esac
+}
+
+# Languages hooks are customized for (empty when the type is unknown)
+hook_target_languages() {
+    case "$PROJECT_TYPE" in
+        ""|unknown|auto) ;;
+        multi) echo "${PROJECT_LANGUAGES[*]}" ;;
+        *) echo "$PROJECT_TYPE" ;;
+    esac
+}
+
+# Identifies what a customized hooks.json was pruned for: the target
+# languages plus the override file, if any
+hooks_customization_key() {
+    local languages conf_sha="-"
+    languages="$(hook_target_languages)"
+    if [[ -f "$HOOK_LANGUAGES_FILE" ]]; then
+        conf_sha="$(file_sha256 "$HOOK_LANGUAGES_FILE")"
+    fi
+    echo "${languages// /,}:$conf_sha"
+}
+
+# Whether hooks.json with hash $1 is our customization of the current
+# upstream version, for the current languages. The state file records
+# "<upstream sha256> <installed sha256> <key>" when hooks.json was pruned.
+hooks_json_is_current() {
+    local sha="$1"
+    local upstream_sha installed_sha key
+    [[ -f "$HOOKS_STATE_FILE" ]] || return 1
+    read -r upstream_sha installed_sha key < "$HOOKS_STATE_FILE" || return 1
+    
+    [[ "$installed_sha" == "$sha" &&
+        "$upstream_sha" == "$(manifest_sha256 ".claude/hooks.json")" &&
+        "$key" == "$(hooks_customization_key)" ]]
+}
+
+# Customize hooks for project type: rewrite hooks.json without the hooks
+# that cannot apply to any detected language, so they are never spawned.
+# The upstream hash is recorded so later runs do not see the pruned file
+# as out of date.
+customize_hooks_for_project() {
+    if [[ ! -f ".claude/hooks.json" ]]; then
+        return 0
+    fi
+    
+    # Only an upstream copy is pruned: one fetched by this run or matching
+    # the manifest. Our own earlier customization is left as it is, and so
+    # is a copy the user edited.
+    local sha upstream_sha
+    sha="$(file_sha256 ".claude/hooks.json")"
+    if [[ " ${FETCHED_FILES[*]} " == *" .claude/hooks.json "* ||
+        "$sha" == "$(manifest_sha256 ".claude/hooks.json")" ]]; then
+        upstream_sha="$sha"
+    else
+        return 0
+    fi
+    rm -f "$HOOKS_STATE_FILE"
+    
+    local languages=()
+    read -r -a languages <<< "$(hook_target_languages)"
+    if [[ ${#languages[@]} -eq 0 ]]; then
+        return 0
+    fi
+    
+    log_info "Configuring hooks for: ${languages[*]}"
+    
+    # Collect hooks with no overlap with the project's languages
+    local hook_file hook_name supported language disabled=()
+    for hook_file in .claude/hooks/*/*; do
+        hook_name="$(basename "$hook_file")"
+        supported="$(hook_languages "$hook_name")"
+        if [[ -z "$supported" ]]; then
+            continue
+        fi
+        local relevant=false
+        for language in "${languages[@]}"; do
+            if [[ " $supported " == *" $language "* ]]; then
+                relevant=true
+            fi
+        done
+        if [[ "$relevant" == false ]]; then
+            disabled+=("$hook_name")
         fi
     done
     
-    log_success "Installed $installed_prompts professional prompts"
+    if [[ ${#disabled[@]} -eq 0 ]]; then
+        return 0
+    fi
+    
+    if python3 - ".claude/hooks.json" "${disabled[@]}" << 'EOF'
+import json
+import os
+import sys
+
+path, disabled = sys.argv[1], set(sys.argv[2:])
+with open(path) as f:
+    config = json.load(f)
+
+
+def hook_name(hook):
+    command = str(hook.get("command", "")).split()
+    return os.path.basename(command[0]) if command else ""
+
+
+# Events live at the top level or under "hooks"
+events = config.get("hooks") if isinstance(config.get("hooks"), dict) else config
+for event, groups in events.items():
+    if not isinstance(groups, list):
+        continue
+    kept = []
+    for group in groups:
+        hooks = [hook for hook in group.get("hooks", []) if hook_name(hook) not in disabled]
+        if hooks:
+            kept.append(dict(group, hooks=hooks))
+    events[event] = kept
+
+with open(path + ".part", "w") as f:
+    json.dump(config, f, indent=2)
+    f.write("\n")
+os.replace(path + ".part", path)
+EOF
+    then
+        mkdir -p "$(dirname "$HOOKS_STATE_FILE")"
+        echo "$upstream_sha $(file_sha256 ".claude/hooks.json") $(hooks_customization_key)" > "$HOOKS_STATE_FILE"
+        log_info "Disabled hooks not relevant to this project: ${disabled[*]}"
+    else
+        log_warning "Could not customize .claude/hooks.json; keeping all hooks"
+    fi
+}
+
+# Install MCP configuration
+install_mcp_config() {
+    if [[ "$HOOKS_ONLY" == true ]]; then
+        return 0
+    fi
+    
+    log_step "Installing MCP configuration..."
+    
+    download_template_file ".claude/.mcp.json" ".claude/.mcp.json" false
+    
+    if [[ -f ".claude/.mcp.json" ]]; then
+        log_success "MCP configuration installed"
+    else
+        log_warning "MCP configuration not available"
+    fi
+}
+
+# Install commands
+install_commands() {
+    if [[ "$HOOKS_ONLY" == true ]]; then
+        return 0
+    fi
+    
+    log_step "Installing command suite..."
+    
+    download_template_file ".claude/commands.json" ".claude/commands.json" false
+    
+    if [[ -f ".claude/commands.json" ]]; then
+        log_success "Command suite installed (32 professional commands)"
+    else
+        log_warning "Command suite not available"
+    fi
+}
+
+# Install prompts
+install_prompts() {
+    if [[ "$HOOKS_ONLY" == true ]]; then
+        return 0
+    fi
+    
+    log_step "Installing professional prompts..."
+    
+    # Create prompts directory structure
+    mkdir -p ".claude/prompts"/{development,testing,architecture,security,deployment,documentation,workflow,project-management}
+    
+    # Queue prompts that are missing or out of date
+    local prompt_file
+    while read -r prompt_file; do
+        queue_template_file "$prompt_file" false
+    done < <(manifest_stale_files prompts)
+    local up_to_date=$(( $(manifest_count prompts) - ${#FETCH_QUEUE[@]} ))
+    run_fetch_queue
+    
+    log_success "Installed ${#FETCHED_FILES[@]} professional prompts ($up_to_date already up to date)"
 }
 
 # Install settings template
@@ -519,15 +1711,13 @@ install_settings() {
     fi
 }
 
-# Setup environment variables
-setup_environment() {
-    log_step "Setting up environment..."
-    
+# Write the environment setup script to $1
+write_setup_env() {
+    local target_path="$1"
     local project_name
     project_name="$(basename "$TARGET_DIR")"
     
-    # Create environment setup script
-    cat > ".claude/setup-env.sh" << EOF
+    cat > "$target_path" << EOF
 #!/bin/bash
 # Claude Code Template Environment Setup
 
@@ -545,8 +1735,17 @@ echo "CLAUDE_LOGS_DIR: \$CLAUDE_LOGS_DIR"
 
 # Run this script with: source .claude/setup-env.sh
 EOF
+}
+
+# Setup environment variables
+setup_environment() {
+    log_step "Setting up environment..."
     
-    chmod +x ".claude/setup-env.sh"
+    # Create environment setup script (renamed into place so hardlinked
+    # backups keep the previous version)
+    write_setup_env ".claude/setup-env.sh.part"
+    chmod +x ".claude/setup-env.sh.part"
+    mv -f ".claude/setup-env.sh.part" ".claude/setup-env.sh"
     log_success "Environment setup script created"
 }
 
@@ -559,32 +1758,174 @@ post_install() {
     
     # Create context directory
     mkdir -p ".claude/context"
+    save_language_map
     
     # Initialize logs
     mkdir -p ".claude/hooks/logs"
     touch ".claude/hooks/logs/hooks.log"
     
-    # Set proper permissions
-    find ".claude" -name "*.sh" -exec chmod +x {} \; 2>/dev/null || true
-    find ".claude" -name "*.py" -exec chmod +x {} \; 2>/dev/null || true
+    # Set permissions from the manifest; generated data under logs/,
+    # context/ and knowledge/ is never traversed
+    apply_manifest_modes
     
     log_success "Post-installation tasks completed"
 }
 
+# List hooks configured in hooks.json as "event<TAB>tool<TAB>timeout_ms<TAB>command",
+# one line per distinct command
+list_configured_hooks() {
+    python3 - ".claude/hooks.json" << 'EOF'
+import json
+import sys
+
+with open(sys.argv[1]) as f:
+    config = json.load(f)
+
+events = config.get("hooks") if isinstance(config.get("hooks"), dict) else config
+seen = set()
+for event, groups in events.items():
+    if not isinstance(groups, list):
+        continue
+    for group in groups:
+        tool = (group.get("matcher") or "Edit").split("|")[0].strip() or "Edit"
+        for hook in group.get("hooks", []):
+            command = hook.get("command")
+            if not command or command in seen:
+                continue
+            seen.add(command)
+            print("\t".join([event, tool, str(int(hook.get("timeout", 60000))), command]))
+EOF
+}
+
+# Run one hook $SMOKE_RUNS times with a synthetic payload and record
+# "status p50_ms p95_ms" in $5 (status: ok, timeout or exit code)
+smoke_test_hook() {
+    local event="$1"
+    local tool="$2"
+    local timeout_ms="$3"
+    local command="$4"
+    local result_file="$5"
+    local sample_file="$WORK_DIR/smoke/sample.$(smoke_sample_extension)"
+    local payload_file="$result_file.payload"
+    
+    local tool_input="{\"file_path\": $(json_string "$sample_file"), \"old_string\": \"\", \"new_string\": \"\"}"
+    if [[ "$tool" == "Bash" ]]; then
+        tool_input='{"command": "git status"}'
+    fi
+    cat > "$payload_file" << EOF
+{"session_id": "bootstrap-smoke-test", "hook_event_name": $(json_string "$event"), "tool_name": $(json_string "$tool"), "tool_input": $tool_input, "cwd": $(json_string "$(pwd)")}
+EOF
+    
+    local run start elapsed exit_code status="ok" samples=()
+    for ((run = 0; run < SMOKE_RUNS; run++)); do
+        start="$(now_ms)"
+        exit_code=0
+        run_with_timeout "$timeout_ms" bash -c "$command \"\$1\"" smoke "$sample_file" \
+            < "$payload_file" > /dev/null 2>&1 || exit_code=$?
+        elapsed=$(( $(now_ms) - start ))
+        samples+=("$elapsed")
+        
+        if [[ $elapsed -ge $timeout_ms ]]; then
+            status="timeout"
+            break
+        elif [[ $exit_code -ne 0 ]]; then
+            status="exit $exit_code"
+        fi
+    done
+    
+    # Nearest-rank percentiles
+    local sorted=() value
+    while read -r value; do
+        sorted+=("$value")
+    done < <(printf '%s\n' "${samples[@]}" | sort -n)
+    local count=${#sorted[@]}
+    local p50=${sorted[$(( (count * 50 + 99) / 100 - 1 ))]}
+    local p95=${sorted[$(( (count * 95 + 99) / 100 - 1 ))]}
+    
+    echo "${status// /_} $p50 $p95" > "$result_file"
+}
+
+# Synthetic source file extension for the project type
+smoke_sample_extension() {
+    case "$PROJECT_TYPE" in
+        python) echo "py" ;;
+        go) echo "go" ;;
+        java) echo "java" ;;
+        rust) echo "rs" ;;
+        *) echo "js" ;;
+    esac
+}
+
+# Invoke every configured hook with a synthetic payload, in parallel, and
+# report p50/p95 latency against each hook's timeout
+smoke_test_hooks() {
+    if [[ "$SMOKE_RUNS" -eq 0 || ! -f ".claude/hooks.json" ]]; then
+        return 0
+    fi
+    
+    local events=() tools=() timeouts=() commands=()
+    local event tool timeout_ms command
+    while IFS=$'\t' read -r event tool timeout_ms command; do
+        events+=("$event")
+        tools+=("$tool")
+        timeouts+=("$timeout_ms")
+        commands+=("$command")
+    done < <(list_configured_hooks 2>/dev/null)
+    
+    if [[ ${#commands[@]} -eq 0 ]]; then
+        log_warning "No hooks configured in .claude/hooks.json"
+        return 1
+    fi
+    
+    mkdir -p "$WORK_DIR/smoke"
+    touch "$WORK_DIR/smoke/sample.$(smoke_sample_extension)"
+    
+    local i
+    for ((i = 0; i < ${#commands[@]}; i++)); do
+        pool_wait_for_slot "$(cpu_count)"
+        smoke_test_hook "${events[$i]}" "${tools[$i]}" "${timeouts[$i]}" "${commands[$i]}" \
+            "$WORK_DIR/smoke/$i" &
+        POOL_PIDS+=($!)
+    done
+    pool_wait_all
+    
+    local failed=0 status p50 p95 name
+    printf "   %-34s %8s %8s %9s  %s\n" "hook ($SMOKE_RUNS runs)" "p50" "p95" "timeout" "status"
+    for ((i = 0; i < ${#commands[@]}; i++)); do
+        status="failed"
+        p50=0
+        p95=0
+        [[ -f "$WORK_DIR/smoke/$i" ]] && read -r status p50 p95 < "$WORK_DIR/smoke/$i"
+        status="${status//_/ }"
+        name="$(basename "${commands[$i]%% *}")"
+        
+        if [[ "$status" == "ok" ]]; then
+            printf "   %-34s %6sms %6sms %7sms  ${GREEN}%s${NC}\n" "$name" "$p50" "$p95" "${timeouts[$i]}" "$status"
+        else
+            printf "   %-34s %6sms %6sms %7sms  ${YELLOW}%s${NC}\n" "$name" "$p50" "$p95" "${timeouts[$i]}" "$status"
+            failed=$((failed + 1))
+        fi
+        if [[ -n "$PROFILE_FILE" ]]; then
+            PROFILE_HOOKS+=("$name ${status// /_} $p50 $p95 ${timeouts[$i]}")
+        fi
+    done
+    
+    if [[ $failed -gt 0 ]]; then
+        log_warning "$failed of ${#commands[@]} hooks failed or timed out"
+        return 1
+    fi
+    log_success "All ${#commands[@]} hooks responded within their timeouts"
+}
+
 # Test installation
 test_installation() {
     log_step "Testing installation..."
     
     local test_passed=true
     
-    # Test hook execution
-    if [[ -f ".claude/hooks/post-tool-use/format-code.sh" ]]; then
-        if ./.claude/hooks/post-tool-use/format-code.sh "/nonexistent/test.js" >/dev/null 2>&1; then
-            log_success "Hook system is working"
-        else
-            log_warning "Hook system test failed"
-            test_passed=false
-        fi
+    # Exercise every configured hook
+    if ! smoke_test_hooks; then
+        test_passed=false
     fi
     
     # Test Neo4j utility
@@ -651,11 +1992,279 @@ show_summary() {
     echo -e "${GREEN}Happy coding with Claude! 🚀${NC}"
 }
 
+# Quote a value as a JSON string
+json_string() {
+    local value="$1"
+    value="${value//\\/\\\\}"
+    value="${value//\"/\\\"}"
+    printf '"%s"' "$value"
+}
+
+# Expand BATCH_SPECS into target directories, one per line
+list_batch_targets() {
+    local spec line list_dir match matched
+    for spec in "${BATCH_SPECS[@]}"; do
+        if [[ -f "$spec" ]]; then
+            # Relative entries are relative to the list file, not the caller
+            list_dir="$(cd "$(dirname "$spec")" && pwd)"
+            while read -r line || [[ -n "$line" ]]; do
+                [[ -z "$line" || "$line" == \#* ]] && continue
+                if [[ "$line" == /* ]]; then
+                    echo "$line"
+                else
+                    echo "$list_dir/$line"
+                fi
+            done < "$spec"
+        elif [[ -d "$spec" ]]; then
+            echo "$spec"
+        else
+            # Globs may also match plain files; only directories are targets
+            matched=false
+            while read -r match; do
+                if [[ -n "$match" && -d "$match" ]]; then
+                    echo "$match"
+                    matched=true
+                fi
+            done < <(compgen -G "$spec")
+            [[ "$matched" == true ]] || log_warning "No directories match: $spec" >&2
+        fi
+    done
+}
+
+# Options every batch child inherits from this invocation
+batch_child_args() {
+    local args=(--mode "$INSTALL_MODE" --jobs "$DOWNLOAD_JOBS" --detect-depth "$DETECT_MAX_DEPTH"
+        --cache-dir "$CACHE_DIR" --cache-size "$CACHE_MAX_MB"
+        --backup-strategy "$BACKUP_STRATEGY" --backup-keep "$BACKUP_KEEP" --smoke-runs "$SMOKE_RUNS")
+    [[ -n "$PROJECT_TYPE" ]] && args+=(--type "$PROJECT_TYPE")
+    [[ "$FORCE_INSTALL" == true ]] && args+=(--force)
+    [[ "$UPGRADE" == true ]] && args+=(--upgrade)
+    [[ "$USE_CACHE" != true ]] && args+=(--no-cache)
+    [[ -n "$BUNDLE_SOURCE" ]] && args+=(--bundle "$BUNDLE_SOURCE")
+    printf '%s\n' "${args[@]}"
+}
+
+# Install into one batch target, recording "exit_code elapsed_ms" in $3
+batch_worker() {
+    local target="$1"
+    local log_file="$2"
+    local result_file="$3"
+    local start exit_code=0
+    start="$(now_ms)"
+    
+    if [[ ! -d "$target" ]]; then
+        echo "Target directory does not exist: $target" > "$log_file"
+        exit_code=127
+    else
+        local profile_args=()
+        if [[ -n "$PROFILE_FILE" ]]; then
+            profile_args=(--profile "${log_file%.log}.profile.json")
+        fi
+        CLAUDE_BOOTSTRAP_RESULT="$result_file.type" \
+            bash "$SCRIPT_PATH" "${CHILD_ARGS[@]}" "${profile_args[@]}" --dir "$target" \
+            < /dev/null > "$log_file" 2>&1 || exit_code=$?
+    fi
+    
+    echo "$exit_code $(( $(now_ms) - start ))" > "$result_file"
+}
+
+# Warm the shared cache once so concurrent installs do not all hit the network
+warm_batch_cache() {
+    if [[ "$USE_CACHE" != true ]]; then
+        return 0
+    fi
+    
+    log_step "Warming template cache..."
+    if [[ "$BUNDLE_SOURCE" == "remote" ]]; then
+        fetch_template_bundle
+        return 0
+    elif [[ -n "$BUNDLE_SOURCE" ]]; then
+        return 0
+    fi
+    
+    load_template_manifest
+    mkdir -p "$WORK_DIR/warm"
+    (
+        cd "$WORK_DIR/warm"
+        local i
+        for ((i = 0; i < ${#MANIFEST_PATHS[@]}; i++)); do
+            # Unhashed entries are never cached, so there is nothing to warm
+            [[ "${MANIFEST_SHA256[$i]}" == "-" ]] && continue
+            queue_template_file "${MANIFEST_PATHS[$i]}" false
+        done
+        run_fetch_queue > /dev/null
+    )
+    log_success "Template cache ready: $CACHE_DIR"
+}
+
+# Install the template into every batch target with BATCH_JOBS concurrent
+# installs, then write a JSON summary
+run_batch() {
+    if [[ -z "$SCRIPT_PATH" ]]; then
+        log_error "Batch mode needs bootstrap.sh on disk (it cannot be piped through curl)"
+        exit 1
+    fi
+    
+    setup_work_dir
+    check_prerequisites
+    
+    local targets=() target
+    while read -r target; do
+        targets+=("$target")
+    done < <(list_batch_targets)
+    if [[ ${#targets[@]} -eq 0 ]]; then
+        log_error "No batch targets found"
+        exit 1
+    fi
+    
+    warm_batch_cache
+    
+    local log_dir="${BATCH_SUMMARY%.json}-logs"
+    mkdir -p "$log_dir"
+    log_dir="$(cd "$log_dir" && pwd)"
+    
+    CHILD_ARGS=()
+    local arg
+    while read -r arg; do
+        CHILD_ARGS+=("$arg")
+    done < <(batch_child_args)
+    
+    log_step "Installing into ${#targets[@]} projects ($BATCH_JOBS at a time)..."
+    
+    local batch_start i
+    batch_start="$(now_ms)"
+    mkdir -p "$WORK_DIR/batch"
+    for ((i = 0; i < ${#targets[@]}; i++)); do
+        target="${targets[$i]}"
+        if [[ -d "$target" ]]; then
+            target="$(cd "$target" && pwd)"
+            targets[$i]="$target"
+        fi
+        pool_wait_for_slot "$BATCH_JOBS"
+        batch_worker "$target" "$log_dir/$i-$(basename "$target").log" "$WORK_DIR/batch/$i" &
+        POOL_PIDS+=($!)
+    done
+    pool_wait_all
+    
+    # Report in input order and build the summary
+    local succeeded=0 failed=0 exit_code elapsed project_type status entries=""
+    for ((i = 0; i < ${#targets[@]}; i++)); do
+        target="${targets[$i]}"
+        exit_code=1
+        elapsed=0
+        project_type=""
+        [[ -f "$WORK_DIR/batch/$i" ]] && read -r exit_code elapsed < "$WORK_DIR/batch/$i"
+        [[ -f "$WORK_DIR/batch/$i.type" ]] && read -r project_type < "$WORK_DIR/batch/$i.type"
+        
+        if [[ "$exit_code" -eq 0 ]]; then
+            status="ok"
+            succeeded=$((succeeded + 1))
+            echo -e "   ${GREEN}✓${NC} $target ($project_type, ${elapsed}ms)"
+        else
+            status="failed"
+            failed=$((failed + 1))
+            echo -e "   ${RED}✗${NC} $target (exit $exit_code, ${elapsed}ms)"
+        fi
+        
+        [[ -n "$entries" ]] && entries+=","
+        entries+="
+    {\"dir\": $(json_string "$target"), \"status\": \"$status\", \"exit_code\": $exit_code, \"elapsed_ms\": $elapsed, \"project_type\": $(if [[ -n "$project_type" ]]; then json_string "$project_type"; else echo null; fi), \"log\": $(json_string "$log_dir/$i-$(basename "$target").log")}"
+    done
+    
+    cat > "$BATCH_SUMMARY" << EOF
+{
+  "template_version": $(json_string "$TEMPLATE_VERSION"),
+  "total": ${#targets[@]},
+  "succeeded": $succeeded,
+  "failed": $failed,
+  "elapsed_ms": $(( $(now_ms) - batch_start )),
+  "targets": [$entries
+  ]
+}
+EOF
+    
+    log_info "Summary written to $BATCH_SUMMARY"
+    if [[ $failed -gt 0 ]]; then
+        log_error "$failed of ${#targets[@]} installs failed (logs: $log_dir)"
+        exit 1
+    fi
+    log_success "Installed into ${#targets[@]} projects"
+}
+
+# Run a main phase, recording its wall time when profiling
+run_phase() {
+    if [[ -z "$PROFILE_FILE" ]]; then
+        "$@"
+        return 0
+    fi
+    
+    local start
+    start="$(now_ms)"
+    "$@"
+    PROFILE_PHASES+=("$1 $(( $(now_ms) - start ))")
+}
+
+# Write the --profile report
+write_profile_report() {
+    local total_ms="$1"
+    local entry name elapsed status source file_path phases="" downloads="" hooks=""
+    local p50 p95 timeout_ms
+    
+    for entry in "${PROFILE_PHASES[@]}"; do
+        read -r name elapsed <<< "$entry"
+        [[ -n "$phases" ]] && phases+=","
+        phases+="
+    {\"name\": $(json_string "$name"), \"elapsed_ms\": $elapsed}"
+    done
+    for entry in "${PROFILE_DOWNLOADS[@]}"; do
+        read -r status elapsed source file_path <<< "$entry"
+        [[ -n "$downloads" ]] && downloads+=","
+        downloads+="
+    {\"path\": $(json_string "$file_path"), \"status\": \"$status\", \"source\": \"$source\", \"elapsed_ms\": $elapsed}"
+    done
+    
+    for entry in "${PROFILE_HOOKS[@]}"; do
+        read -r name status p50 p95 timeout_ms <<< "$entry"
+        [[ -n "$hooks" ]] && hooks+=","
+        hooks+="
+    {\"hook\": $(json_string "$name"), \"status\": $(json_string "${status//_/ }"), \"p50_ms\": $p50, \"p95_ms\": $p95, \"timeout_ms\": $timeout_ms}"
+    done
+    
+    mkdir -p "$(dirname "$PROFILE_FILE")"
+    cat > "$PROFILE_FILE" << EOF
+{
+  "template_version": $(json_string "$TEMPLATE_VERSION"),
+  "target_dir": $(json_string "$(pwd)"),
+  "project_type": $(json_string "$PROJECT_TYPE"),
+  "download_mode": "$(if [[ -n "$BUNDLE_SOURCE" ]]; then echo bundle; else echo files; fi)",
+  "download_jobs": $DOWNLOAD_JOBS,
+  "total_ms": $total_ms,
+  "phases": [$phases
+  ],
+  "downloads": [$downloads
+  ],
+  "hooks": [$hooks
+  ]
+}
+EOF
+    log_info "Profile written to $PROFILE_FILE"
+}
+
 # Main installation flow
 main() {
     show_banner
     parse_args "$@"
     
+    if [[ "$GENERATE_MANIFEST" == true ]]; then
+        generate_manifest
+        exit 0
+    fi
+    
+    if [[ ${#BATCH_SPECS[@]} -gt 0 ]]; then
+        run_batch
+        exit 0
+    fi
+    
     # Change to target directory
     if [[ "$TARGET_DIR" != "$(pwd)" ]]; then
         if [[ ! -d "$TARGET_DIR" ]]; then
@@ -666,26 +2275,45 @@ main() {
         log_info "Installing in: $TARGET_DIR"
     fi
     
-    check_prerequisites
-    detect_project_type
-    interactive_config
+    local install_start=0
+    if [[ -n "$PROFILE_FILE" ]]; then
+        install_start="$(now_ms)"
+    fi
     
-    if [[ "$FORCE_INSTALL" == true ]]; then
-        create_backup
+    setup_work_dir
+    run_phase check_prerequisites
+    run_phase detect_project_type
+    run_phase interactive_config
+    run_phase fetch_template_bundle
+    run_phase load_template_manifest
+    
+    if [[ "$UPGRADE" == true ]]; then
+        run_phase create_upgrade_backup
+    elif [[ "$FORCE_INSTALL" == true ]]; then
+        run_phase create_backup
     fi
     
     # Installation steps
-    install_core_files
-    install_hooks
-    install_mcp_config
-    install_commands
-    install_prompts
-    install_settings
-    setup_environment
-    post_install
-    test_installation
+    run_phase install_core_files
+    run_phase install_hooks
+    run_phase install_mcp_config
+    run_phase install_commands
+    run_phase install_prompts
+    run_phase install_settings
+    run_phase setup_environment
+    run_phase post_install
+    run_phase test_installation
+    run_phase prune_template_cache
     
     show_summary
+    
+    if [[ -n "$PROFILE_FILE" ]]; then
+        write_profile_report $(( $(now_ms) - install_start ))
+    fi
+    
+    if [[ -n "$BATCH_RESULT_FILE" ]]; then
+        echo "$PROJECT_TYPE" > "$BATCH_RESULT_FILE"
+    fi
 }
 
 # Run main function with all arguments